@@ -43,12 +43,13 @@ async function sha256(data) {
  * @returns {Object} Deterministic subset for hashing
  */
 function extractDeterministicData(sessionData) {
-  // Extract only the fields used for hash calculation
+  // Extract only the fields used for hash calculation. Keys are listed in
+  // sorted order to match the server's sort_keys=True serialization.
   const deterministic = {
+    keystrokes: { key: [], timestamp: [], wordIndex: [] },
     seed: sessionData.seed,
     stage: sessionData.stage,
-    words: [],
-    keystrokes: []
+    words: []
   };
 
   // Extract word texts in sorted order
@@ -59,13 +60,14 @@ function extractDeterministicData(sessionData) {
       .sort(); // Sort alphabetically for consistency
   }
 
-  // Extract keystrokes with deterministic fields only
+  // Extract deterministic keystroke fields as parallel arrays (struct-of-arrays)
   if (sessionData.keystrokes && Array.isArray(sessionData.keystrokes)) {
-    deterministic.keystrokes = sessionData.keystrokes.map(k => ({
-      key: k.key,
-      timestamp: k.timestamp,
-      wordIndex: k.wordIndex
-    }));
+    const keystrokes = sessionData.keystrokes;
+    deterministic.keystrokes = {
+      key: keystrokes.map(k => k.key),
+      timestamp: keystrokes.map(k => k.timestamp),
+      wordIndex: keystrokes.map(k => k.wordIndex)
+    };
   }
 
   return deterministic;
@@ -2,15 +2,67 @@
 """
 Cloudflare KV API Client
 Handles communication with Cloudflare KV storage for queue operations
-No external dependencies - uses only standard library
+Uses orjson when installed, otherwise only the standard library
 """
 
+import gzip
+import http.client
 import json
 import os
-import urllib.request
-import urllib.error
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+API_HOST = "api.cloudflare.com"
+
+# Seconds to wait on connect/read before giving up on a request
+REQUEST_TIMEOUT = 30
+
+# Maximum number of keys Cloudflare accepts per bulk read
+BULK_GET_LIMIT = 100
+
+# Maximum number of keys Cloudflare accepts per bulk delete
+BULK_DELETE_LIMIT = 10000
+
+# Worker threads used to overlap independent KV requests
+MAX_WORKERS = 32
+
+# Retries (with exponential backoff) when Cloudflare rate limits a request
+RATE_LIMIT_RETRIES = 5
+RATE_LIMIT_BACKOFF = 0.5
+
+
+def _dumps(value: Any) -> bytes:
+    """Encode a value as UTF-8 JSON bytes"""
+    if orjson is not None:
+        # orjson rejects some values stdlib json accepts (ints beyond 64 bits,
+        # non-str keys), so fall back to json for those
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            pass
+    return json.dumps(value).encode('utf-8')
+
+
+def _loads(payload: bytes) -> Any:
+    """Parse UTF-8 JSON bytes"""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+# Built once so every connection shares the parsed CA bundle
+_SSL_CONTEXT = ssl.create_default_context()
+_SSL_CONTEXT.set_alpn_protocols(['http/1.1'])
+
 
 class CloudflareKV:
     """Client for Cloudflare KV operations"""
@@ -27,7 +79,48 @@ class CloudflareKV:
         self.account_id = account_id
         self.api_token = api_token
         self.namespace_id = namespace_id
-        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}"
+        self.base_path = f"/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}"
+        self.base_url = f"https://{API_HOST}{self.base_path}"
+        # Idle keep-alive connections, checked out by whichever thread needs one;
+        # pooling (rather than one per thread) lets short-lived worker pools reuse them
+        self._idle: List[http.client.HTTPSConnection] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "CloudflareKV":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _acquire_connection(self, fresh: bool = False) -> http.client.HTTPSConnection:
+        """
+        Check out an idle keep-alive connection, opening a new one if none is free
+
+        Args:
+            fresh: Always open a new connection (e.g. after a stale one failed)
+
+        Returns:
+            Connection to the Cloudflare API
+        """
+        if not fresh:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+        return http.client.HTTPSConnection(API_HOST, timeout=REQUEST_TIMEOUT, context=_SSL_CONTEXT)
+
+    def _release_connection(self, conn: http.client.HTTPSConnection) -> None:
+        """Return a healthy connection to the idle pool"""
+        with self._lock:
+            self._idle.append(conn)
+
+    def close(self) -> None:
+        """Close all idle persistent HTTPS connections"""
+        with self._lock:
+            connections = self._idle
+            self._idle = []
+
+        for conn in connections:
+            conn.close()
 
     def _make_request(self, endpoint: str, method: str = "GET", data: Optional[bytes] = None) -> Any:
         """
@@ -41,25 +134,56 @@ class CloudflareKV:
         Returns:
             Parsed JSON response or None
         """
-        url = f"{self.base_url}{endpoint}"
+        path = f"{self.base_path}{endpoint}"
 
-        request = urllib.request.Request(url, method=method)
-        request.add_header("Authorization", f"Bearer {self.api_token}")
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip"
+        }
 
         if data:
-            request.add_header("Content-Type", "application/json")
-            request.data = data
+            headers["Content-Type"] = "application/json"
+
+        # Reuse the open connection; reconnect once if the server dropped it
+        reconnected = False
+        retries = 0
+        while True:
+            conn = self._acquire_connection(fresh=reconnected)
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                if not reconnected:
+                    reconnected = True
+                    continue
+                print(f"Error making request: {e}")
+                return None
+            except Exception as e:
+                conn.close()
+                print(f"Error making request: {e}")
+                return None
+
+            self._release_connection(conn)
+
+            # Back off exponentially when rate limited
+            if response.status == 429 and retries < RATE_LIMIT_RETRIES:
+                time.sleep(RATE_LIMIT_BACKOFF * (2 ** retries))
+                retries += 1
+                continue
+            break
 
         try:
-            with urllib.request.urlopen(request) as response:
-                if response.status == 200:
-                    return json.loads(response.read().decode('utf-8'))
-                return None
-        except urllib.error.HTTPError as e:
-            print(f"HTTP Error {e.code}: {e.reason}")
-            if hasattr(e, 'read'):
-                error_body = e.read().decode('utf-8')
-                print(f"Error details: {error_body}")
+            if response.getheader("Content-Encoding", "").lower() == "gzip":
+                body = gzip.decompress(body)
+
+            if response.status == 200:
+                return _loads(body)
+            if response.status >= 400:
+                print(f"HTTP Error {response.status}: {response.reason}")
+                print(f"Error details: {body.decode('utf-8')}")
             return None
         except Exception as e:
             print(f"Error making request: {e}")
@@ -99,6 +223,47 @@ class CloudflareKV:
         response = self._make_request(endpoint)
         return response
 
+    def get_values(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Get values for many keys using the bulk read endpoint
+
+        Args:
+            keys: Key names to fetch (chunked at 100 keys per request)
+
+        Returns:
+            Dictionary mapping key name to parsed JSON value (None if not found)
+        """
+        chunks = [keys[start:start + BULK_GET_LIMIT] for start in range(0, len(keys), BULK_GET_LIMIT)]
+
+        if not chunks:
+            return {}
+        if len(chunks) == 1:
+            return self._bulk_get_chunk(chunks[0])
+
+        # Several chunks: fetch them concurrently
+        values = {}
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+            for result in executor.map(self._bulk_get_chunk, chunks):
+                values.update(result)
+
+        return values
+
+    def _bulk_get_chunk(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Fetch up to BULK_GET_LIMIT keys with one bulk read request
+
+        Args:
+            keys: Key names to fetch
+
+        Returns:
+            Dictionary mapping key name to parsed JSON value
+        """
+        data = _dumps({'keys': keys, 'type': 'json'})
+        response = self._make_request("/bulk/get", method="POST", data=data)
+        if response and 'result' in response:
+            return response['result'].get('values') or {}
+        return {}
+
     def put_value(self, key: str, value: Dict, expiration_ttl: Optional[int] = None) -> bool:
         """
         Store value for a key
@@ -115,7 +280,7 @@ class CloudflareKV:
         if expiration_ttl:
             endpoint += f"?expiration_ttl={expiration_ttl}"
 
-        data = json.dumps(value).encode('utf-8')
+        data = _dumps(value)
         response = self._make_request(endpoint, method="PUT", data=data)
         return response is not None
 
@@ -133,23 +298,62 @@ class CloudflareKV:
         response = self._make_request(endpoint, method="DELETE")
         return response is not None or response == ""
 
+    def map_put(self, items: Dict[str, Dict], expiration_ttl: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Store many values concurrently (one PUT per key)
+
+        Args:
+            items: Dictionary mapping key name to value
+            expiration_ttl: Optional TTL in seconds applied to every key
+
+        Returns:
+            Dictionary mapping key name to success flag
+        """
+        if not items:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            results = executor.map(
+                lambda item: self.put_value(item[0], item[1], expiration_ttl),
+                items.items()
+            )
+            return dict(zip(items.keys(), results))
+
+    def map_delete(self, keys: List[str]) -> Dict[str, bool]:
+        """
+        Delete many keys concurrently (one DELETE per key)
+
+        Prefer bulk_delete() where possible; this is for cases it can't handle.
+
+        Args:
+            keys: Key names to delete
+
+        Returns:
+            Dictionary mapping key name to success flag
+        """
+        if not keys:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            return dict(zip(keys, executor.map(self.delete_key, keys)))
+
     def bulk_delete(self, keys: List[str]) -> bool:
         """
         Delete multiple keys at once
 
         Args:
-            keys: List of key names to delete
+            keys: List of key names to delete (chunked at 10,000 keys per request)
 
         Returns:
             True if successful
         """
-        if not keys:
-            return True
+        for start in range(0, len(keys), BULK_DELETE_LIMIT):
+            data = _dumps(keys[start:start + BULK_DELETE_LIMIT])
+            response = self._make_request("/bulk", method="DELETE", data=data)
+            if response is None:
+                return False
 
-        endpoint = "/bulk"
-        data = json.dumps(keys).encode('utf-8')
-        response = self._make_request(endpoint, method="DELETE", data=data)
-        return response is not None
+        return True
 
 
 def get_client_from_env() -> CloudflareKV:
@@ -183,8 +387,8 @@ def get_client_from_env() -> CloudflareKV:
 def test_connection():
     """Test connection to Cloudflare KV"""
     try:
-        client = get_client_from_env()
-        keys = client.list_keys(limit=1)
+        with get_client_from_env() as client:
+            keys = client.list_keys(limit=1)
         print(f"✓ Connection successful! Found {len(keys)} key(s)")
         return True
     except Exception as e:
@@ -2,15 +2,38 @@
 """
 Static JSON File Generation
 Generates leaderboard.json and feedback.json files with atomic writes
-No external dependencies - uses only standard library
+Uses orjson when installed, otherwise only the standard library
 """
 
+import errno
+import hashlib
+import heapq
+import itertools
 import json
 import os
 import tempfile
-import shutil
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import time
+from typing import Dict, List, Any, Iterable, Iterator, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# Cleared once O_TMPFILE turns out to be unsupported so later writes skip straight to the fallback
+_use_o_tmpfile = hasattr(os, 'O_TMPFILE')
+
+# Errors meaning the OS or filesystem can't do O_TMPFILE + linkat at all
+_O_TMPFILE_UNSUPPORTED = {errno.EOPNOTSUPP, errno.EISDIR, errno.EINVAL, errno.EXDEV}
+
+# Directories already created/checked this run, so batches of writes skip the stat
+_ensured_dirs = set()
 
 
 def ensure_directory_exists(filepath: str) -> None:
@@ -21,79 +44,364 @@ def ensure_directory_exists(filepath: str) -> None:
         filepath: File path to check
     """
     directory = os.path.dirname(filepath)
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
+    if not directory or directory in _ensured_dirs:
+        return
 
+    os.makedirs(directory, exist_ok=True)
+    _ensured_dirs.add(directory)
 
-def atomic_write_json(filepath: str, data: Any, indent: int = 2) -> bool:
+
+def fsync_directory(directory: str) -> None:
     """
-    Write JSON data to file atomically (write to temp, then rename)
+    Flush a directory entry to disk so a rename inside it survives a crash
 
     Args:
-        filepath: Target file path
-        data: Data to write (will be JSON encoded)
-        indent: JSON indentation level
+        directory: Directory to sync
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Not supported on every platform (e.g. Windows)
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def encode_json(data: Any, indent: int = 2, compact: bool = True) -> bytes:
+    """
+    Serialize data to UTF-8 JSON bytes (with orjson when available)
+
+    Args:
+        data: Data to encode
+        indent: JSON indentation level (only used when not compact)
+        compact: Encode minified JSON instead of indented, key-sorted output
 
     Returns:
-        True if successful
+        Encoded JSON
     """
-    try:
-        # Ensure directory exists
-        ensure_directory_exists(filepath)
+    if orjson is not None:
+        # orjson rejects some values stdlib json accepts (ints beyond 64 bits,
+        # non-str keys), so fall back to json for those
+        try:
+            if compact:
+                return orjson.dumps(data)
+            if indent == 2:
+                return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+
+    if compact:
+        return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return json.dumps(data, indent=indent, sort_keys=True).encode('utf-8')
+
+
+def _write_linked_tmpfile(filepath: str, directory: str, payload: bytes, durable: bool) -> None:
+    """
+    Write bytes into an unnamed O_TMPFILE and link it into place (Linux only)
 
-        # Create temp file in same directory (for atomic rename)
-        directory = os.path.dirname(filepath) or '.'
+    The file has no name until it is fully written, so a crash mid-write
+    leaves nothing behind to clean up.
+
+    Args:
+        filepath: Target file path
+        directory: Directory containing the target file
+        payload: Encoded file contents
+        durable: fsync the file before it becomes visible
+
+    Raises:
+        OSError: If O_TMPFILE or /proc linking isn't supported here
+    """
+    fd = os.open(directory, os.O_TMPFILE | os.O_WRONLY, 0o644)
+    with os.fdopen(fd, 'wb') as tmp_file:
+        tmp_file.write(payload)
+        tmp_file.flush()
+        if durable:
+            os.fsync(fd)
+
+        # Passing dst_dir_fd makes os.link use linkat(AT_SYMLINK_FOLLOW), which
+        # resolves the /proc magic link; plain link() fails with EXDEV
+        proc_path = f"/proc/self/fd/{fd}"
+        name = os.path.basename(filepath)
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            try:
+                os.link(proc_path, name, dst_dir_fd=dir_fd)
+            except FileExistsError:
+                # linkat can't overwrite, so link under a temp name and rename over the target
+                tmp_name = f".{name}.{os.urandom(4).hex()}.tmp"
+                os.link(proc_path, tmp_name, dst_dir_fd=dir_fd)
+                try:
+                    os.replace(tmp_name, name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+                except OSError:
+                    os.remove(tmp_name, dir_fd=dir_fd)
+                    raise
+        finally:
+            os.close(dir_fd)
+
+
+def _write_named_tmpfile(filepath: str, directory: str, payload: bytes, durable: bool) -> None:
+    """
+    Write bytes into a named temp file and rename it into place
+
+    Args:
+        filepath: Target file path
+        directory: Directory containing the target file
+        payload: Encoded file contents
+        durable: fsync the file before the rename
+    """
+    try:
         with tempfile.NamedTemporaryFile(
-            mode='w',
+            mode='wb',
             suffix='.tmp',
             prefix='.',
             dir=directory,
             delete=False
         ) as tmp_file:
-            json.dump(data, tmp_file, indent=indent, sort_keys=True)
             tmp_name = tmp_file.name
+            tmp_file.write(payload)
+
+            # Make sure the data hits disk before the rename does
+            if durable:
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
 
         # Atomic rename (on same filesystem)
-        shutil.move(tmp_name, filepath)
-        return True
+        os.replace(tmp_name, filepath)
 
-    except Exception as e:
-        print(f"Error writing {filepath}: {e}")
+    except Exception:
         # Clean up temp file if it exists
         if 'tmp_name' in locals() and os.path.exists(tmp_name):
             try:
                 os.remove(tmp_name)
             except:
                 pass
+        raise
+
+
+def atomic_write_json(
+    filepath: str,
+    data: Any,
+    indent: int = 2,
+    durable: bool = True,
+    compact: bool = True
+) -> bool:
+    """
+    Write JSON data to file atomically (write to temp, then rename)
+
+    Uses an unnamed O_TMPFILE on Linux and falls back to a named temp file
+    elsewhere (macOS, Windows, filesystems without O_TMPFILE support).
+
+    Args:
+        filepath: Target file path
+        data: Data to write (will be JSON encoded)
+        indent: JSON indentation level (only used when compact is False)
+        durable: fsync the file and its directory so the write survives a crash
+            (disable for tmpfs or other throwaway output)
+        compact: Write minified JSON; pass False for indented, key-sorted
+            output when debugging
+
+    Returns:
+        True if successful
+    """
+    global _use_o_tmpfile
+
+    try:
+        payload = encode_json(data, indent, compact)
+
+        # Ensure directory exists
+        ensure_directory_exists(filepath)
+
+        # Temp file must live in the same directory (for atomic rename)
+        directory = os.path.dirname(filepath) or '.'
+
+        written = False
+        if _use_o_tmpfile:
+            try:
+                _write_linked_tmpfile(filepath, directory, payload, durable)
+                written = True
+            except OSError as e:
+                # Fall back for this write; only give up on O_TMPFILE for good if
+                # it's unsupported (not for transient errors like ENOSPC)
+                if e.errno in _O_TMPFILE_UNSUPPORTED:
+                    _use_o_tmpfile = False
+
+        if not written:
+            _write_named_tmpfile(filepath, directory, payload, durable)
+
+        if durable:
+            fsync_directory(directory)
+        return True
+
+    except Exception as e:
+        print(f"Error writing {filepath}: {e}")
         return False
 
 
-def load_json_safe(filepath: str, default: Any = None) -> Any:
+def decode_json(payload: bytes) -> Any:
+    """
+    Parse UTF-8 JSON bytes (with orjson when available)
+
+    Args:
+        payload: Encoded JSON
+
+    Returns:
+        Parsed JSON data
+    """
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _stream_json_items(filepath: str, stream_key: str) -> Iterator[Any]:
+    """
+    Yield the items of a top-level array one at a time
+
+    Streams with ijson when installed; otherwise parses the whole file.
+    Yields nothing if the file doesn't exist or is invalid.
+
+    Args:
+        filepath: File path to load from
+        stream_key: Top-level key holding the array
+
+    Yields:
+        Array items
+    """
+    try:
+        with open(filepath, 'rb') as f:
+            if ijson is not None:
+                yield from ijson.items(f, f'{stream_key}.item', use_float=True)
+                return
+            data = decode_json(f.read())
+    except FileNotFoundError:
+        return
+    except Exception as e:
+        print(f"Error loading {filepath}: {e}")
+        return
+
+    if isinstance(data, dict):
+        yield from data.get(stream_key) or []
+
+
+def load_json_safe(filepath: str, default: Any = None, stream_key: Optional[str] = None) -> Any:
     """
     Safely load JSON from file, returning default if file doesn't exist
 
     Args:
         filepath: File path to load from
         default: Default value if file doesn't exist or is invalid
+        stream_key: If given, return a lazy iterator over the items of this
+            top-level array instead of the whole document (default is ignored)
 
     Returns:
-        Parsed JSON data or default value
+        Parsed JSON data or default value (or an item iterator with stream_key)
     """
-    if not os.path.exists(filepath):
-        return default
+    if stream_key is not None:
+        return _stream_json_items(filepath, stream_key)
 
     try:
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            return decode_json(f.read())
+    except FileNotFoundError:
+        return default
     except Exception as e:
         print(f"Error loading {filepath}: {e}")
         return default
 
 
+def content_digest(data: Dict[str, Any], ignore_keys: tuple = ('generated',)) -> bytes:
+    """
+    SHA-256 of the canonical JSON encoding of data, minus volatile keys
+
+    Args:
+        data: Top-level JSON object
+        ignore_keys: Keys excluded from the digest (e.g. the generated timestamp)
+
+    Returns:
+        Raw SHA-256 digest
+    """
+    body = {key: value for key, value in data.items() if key not in ignore_keys}
+    return hashlib.sha256(encode_json(body, compact=False)).digest()
+
+
+def _update_item_digest(hasher: Any, item: Any) -> None:
+    """
+    Feed one array item's canonical encoding into a hashlib object
+
+    Args:
+        hasher: hashlib hash object
+        item: Array item
+    """
+    hasher.update(encode_json(item, compact=False))
+    hasher.update(b'\n')
+
+
+def items_digest(items: Iterable[Any]) -> bytes:
+    """
+    SHA-256 over the canonical encodings of a sequence of array items
+
+    Matches the digest generate_leaderboard feeds to existing_hasher, so new
+    output can be compared with the existing file without parsing it again.
+
+    Args:
+        items: Array items, in order
+
+    Returns:
+        Raw SHA-256 digest
+    """
+    hasher = hashlib.sha256()
+    for item in items:
+        _update_item_digest(hasher, item)
+    return hasher.digest()
+
+
+def content_unchanged(filepath: str, data: Dict[str, Any], ignore_keys: tuple = ('generated',)) -> bool:
+    """
+    Check whether a JSON file already holds the given content
+
+    Lets callers skip rewriting (and fsyncing/committing) identical output.
+    Parses the whole existing file; for large streamed files prefer comparing
+    items_digest against a digest taken while streaming.
+
+    Args:
+        filepath: Existing file to compare against
+        data: Newly generated data
+        ignore_keys: Keys excluded from the comparison
+
+    Returns:
+        True if the file exists and its content matches data
+    """
+    existing = load_json_safe(filepath)
+    if not isinstance(existing, dict):
+        return False
+    return content_digest(existing, ignore_keys) == content_digest(data, ignore_keys)
+
+
+def _hashed_items(items: Iterable[Any], hasher: Any) -> Iterator[Any]:
+    """
+    Pass items through, feeding each one to hasher as it is yielded
+
+    Args:
+        items: Array items
+        hasher: hashlib hash object
+
+    Yields:
+        The same items
+    """
+    for item in items:
+        _update_item_digest(hasher, item)
+        yield item
+
+
 def generate_leaderboard(
     scores: List[Dict[str, Any]],
     existing_path: str = 'data/leaderboard.json',
-    max_scores: int = 50
+    max_scores: int = 50,
+    existing_hasher: Optional[Any] = None
 ) -> Dict[str, Any]:
     """
     Generate leaderboard JSON data
@@ -102,32 +410,30 @@ def generate_leaderboard(
         scores: List of score submissions
         existing_path: Path to existing leaderboard file
         max_scores: Maximum number of scores to keep
+        existing_hasher: hashlib object fed each existing score as it streams
+            past (compare its digest with items_digest of the new scores)
 
     Returns:
         Generated leaderboard data
     """
-    # Load existing leaderboard
-    existing = load_json_safe(existing_path, {'version': 1, 'scores': []})
-
-    # Merge new scores with existing
-    all_scores = existing.get('scores', []) + scores
-
-    # Remove duplicates by sessionHash (keep first occurrence)
-    seen_hashes = set()
-    unique_scores = []
+    # Stream existing scores, then merge new scores after them
+    existing_scores = load_json_safe(existing_path, stream_key='scores')
+    if existing_hasher is not None:
+        # Hash each score as read, before ranks are reassigned below
+        existing_scores = _hashed_items(existing_scores, existing_hasher)
+    all_scores = itertools.chain(existing_scores, scores)
+
+    # Remove duplicates by sessionHash (keep first occurrence), decorating each
+    # kept score with its sort key: WPM descending, then timestamp ascending
+    # (earlier is better), then arrival order so ties stay stable
+    by_hash = {}
     for score in all_scores:
         hash_val = score.get('sessionHash')
-        if hash_val and hash_val not in seen_hashes:
-            seen_hashes.add(hash_val)
-            unique_scores.append(score)
-
-    # Sort by WPM descending, then by timestamp ascending (earlier is better)
-    unique_scores.sort(
-        key=lambda s: (-s.get('wpm', 0), s.get('timestamp', 0))
-    )
+        if hash_val and hash_val not in by_hash:
+            by_hash[hash_val] = (-score.get('wpm', 0), score.get('timestamp', 0), len(by_hash), score)
 
     # Take top scores
-    top_scores = unique_scores[:max_scores]
+    top_scores = [entry[3] for entry in heapq.nsmallest(max_scores, by_hash.values())]
 
     # Assign ranks
     for i, score in enumerate(top_scores, 1):
@@ -136,7 +442,7 @@ def generate_leaderboard(
     # Create leaderboard data
     leaderboard = {
         'version': 1,
-        'generated': int(datetime.now().timestamp() * 1000),  # Unix timestamp in ms
+        'generated': time.time_ns() // 1_000_000,  # Unix timestamp in ms
         'scores': top_scores
     }
 
@@ -145,7 +451,8 @@ def generate_leaderboard(
 
 def generate_feedback(
     feedback_items: List[Dict[str, Any]],
-    existing_path: str = 'data/feedback.json'
+    existing_path: str = 'data/feedback.json',
+    max_items: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Generate feedback JSON data
@@ -153,6 +460,7 @@ def generate_feedback(
     Args:
         feedback_items: List of feedback submissions
         existing_path: Path to existing feedback file
+        max_items: Maximum number of items to keep (None keeps all)
 
     Returns:
         Generated feedback data
@@ -164,23 +472,23 @@ def generate_feedback(
     all_items = existing.get('items', []) + feedback_items
 
     # Remove duplicates by feedbackId (keep first occurrence)
-    seen_ids = set()
-    unique_items = []
+    by_id = {}
     for item in all_items:
         item_id = item.get('feedbackId') or item.get('id')
-        if item_id and item_id not in seen_ids:
-            seen_ids.add(item_id)
-            unique_items.append(item)
+        if item_id:
+            by_id.setdefault(item_id, item)
 
     # Sort by votes descending, then by timestamp descending (newer first)
-    unique_items.sort(
-        key=lambda f: (-f.get('votes', 0), -f.get('timestamp', 0))
-    )
+    sort_key = lambda f: (-f.get('votes', 0), -f.get('timestamp', 0))
+    if max_items is None:
+        unique_items = sorted(by_id.values(), key=sort_key)
+    else:
+        unique_items = heapq.nsmallest(max_items, by_id.values(), key=sort_key)
 
     # Create feedback data
     feedback = {
         'version': 1,
-        'generated': int(datetime.now().timestamp() * 1000),  # Unix timestamp in ms
+        'generated': time.time_ns() // 1_000_000,  # Unix timestamp in ms
         'items': unique_items
     }
 
@@ -224,12 +532,35 @@ def generate_replay_file(
     return atomic_write_json(filepath, replay_data)
 
 
-def validate_leaderboard_schema(data: Dict[str, Any]) -> List[str]:
+# Declarative descriptions of the published JSON files, walked by _validate_schema
+LEADERBOARD_SCHEMA = {
+    'name': 'Leaderboard',
+    'generated_numeric': True,
+    'array_key': 'scores',
+    'item_label': 'Score',
+    'required_item_fields': ['rank', 'sessionHash', 'userId', 'initials', 'wpm', 'accuracy', 'stage'],
+    'allow_id_suffix': False,
+    'item_enums': {}
+}
+
+FEEDBACK_SCHEMA = {
+    'name': 'Feedback',
+    'generated_numeric': False,
+    'array_key': 'items',
+    'item_label': 'Feedback item',
+    'required_item_fields': ['id', 'type', 'description', 'userId'],
+    'allow_id_suffix': True,  # '<field>Id' also satisfies a required field
+    'item_enums': {'type': ['bug', 'feature']}
+}
+
+
+def _validate_schema(data: Dict[str, Any], schema: Dict[str, Any]) -> List[str]:
     """
-    Validate leaderboard.json schema
+    Validate a versioned JSON document against a declarative schema
 
     Args:
-        data: Leaderboard data to validate
+        data: Document to validate
+        schema: One of the *_SCHEMA descriptions above
 
     Returns:
         List of validation errors (empty if valid)
@@ -237,7 +568,7 @@ def validate_leaderboard_schema(data: Dict[str, Any]) -> List[str]:
     errors = []
 
     if not isinstance(data, dict):
-        errors.append("Leaderboard must be an object")
+        errors.append(f"{schema['name']} must be an object")
         return errors
 
     # Check required fields
@@ -248,76 +579,62 @@ def validate_leaderboard_schema(data: Dict[str, Any]) -> List[str]:
 
     if 'generated' not in data:
         errors.append("Missing 'generated' timestamp")
-    elif not isinstance(data['generated'], (int, float)):
+    elif schema['generated_numeric'] and not isinstance(data['generated'], (int, float)):
         errors.append("'generated' must be a number")
 
-    if 'scores' not in data:
-        errors.append("Missing 'scores' array")
-    elif not isinstance(data['scores'], list):
-        errors.append("'scores' must be an array")
+    array_key = schema['array_key']
+    label = schema['item_label']
+    required_fields = schema['required_item_fields']
+    allow_id_suffix = schema['allow_id_suffix']
+    item_enums = schema['item_enums']
+
+    if array_key not in data:
+        errors.append(f"Missing '{array_key}' array")
+    elif not isinstance(data[array_key], list):
+        errors.append(f"'{array_key}' must be an array")
     else:
-        # Validate each score
-        for i, score in enumerate(data['scores']):
-            if not isinstance(score, dict):
-                errors.append(f"Score {i} must be an object")
+        # Validate each item
+        for i, item in enumerate(data[array_key]):
+            if not isinstance(item, dict):
+                errors.append(f"{label} {i} must be an object")
                 continue
 
-            # Check required score fields
-            required_fields = ['rank', 'sessionHash', 'userId', 'initials', 'wpm', 'accuracy', 'stage']
             for field in required_fields:
-                if field not in score:
-                    errors.append(f"Score {i} missing required field: {field}")
+                if field in item or (allow_id_suffix and f'{field}Id' in item):
+                    continue
+                errors.append(f"{label} {i} missing required field: {field}")
+
+            for field, allowed in item_enums.items():
+                if field in item and item[field] not in allowed:
+                    errors.append(f"{label} {i} has invalid {field}: {item[field]}")
 
     return errors
 
 
-def validate_feedback_schema(data: Dict[str, Any]) -> List[str]:
+def validate_leaderboard_schema(data: Dict[str, Any]) -> List[str]:
     """
-    Validate feedback.json schema
+    Validate leaderboard.json schema
 
     Args:
-        data: Feedback data to validate
+        data: Leaderboard data to validate
 
     Returns:
         List of validation errors (empty if valid)
     """
-    errors = []
+    return _validate_schema(data, LEADERBOARD_SCHEMA)
 
-    if not isinstance(data, dict):
-        errors.append("Feedback must be an object")
-        return errors
 
-    # Check required fields
-    if 'version' not in data:
-        errors.append("Missing 'version' field")
-    elif data['version'] != 1:
-        errors.append(f"Unknown version: {data['version']}")
-
-    if 'generated' not in data:
-        errors.append("Missing 'generated' timestamp")
-
-    if 'items' not in data:
-        errors.append("Missing 'items' array")
-    elif not isinstance(data['items'], list):
-        errors.append("'items' must be an array")
-    else:
-        # Validate each item
-        for i, item in enumerate(data['items']):
-            if not isinstance(item, dict):
-                errors.append(f"Feedback item {i} must be an object")
-                continue
-
-            # Check required fields
-            required_fields = ['id', 'type', 'description', 'userId']
-            for field in required_fields:
-                if field not in item and f'{field}Id' not in item:
-                    errors.append(f"Feedback item {i} missing required field: {field}")
+def validate_feedback_schema(data: Dict[str, Any]) -> List[str]:
+    """
+    Validate feedback.json schema
 
-            # Validate type
-            if 'type' in item and item['type'] not in ['bug', 'feature']:
-                errors.append(f"Feedback item {i} has invalid type: {item['type']}")
+    Args:
+        data: Feedback data to validate
 
-    return errors
+    Returns:
+        List of validation errors (empty if valid)
+    """
+    return _validate_schema(data, FEEDBACK_SCHEMA)
 
 
 def test_generation():
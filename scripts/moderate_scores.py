@@ -8,8 +8,8 @@ No external dependencies - uses only standard library
 import json
 import os
 import sys
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import time
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set
 
 
 def load_leaderboard(filepath: str = 'data/leaderboard.json') -> Dict[str, Any]:
@@ -27,7 +27,7 @@ def load_leaderboard(filepath: str = 'data/leaderboard.json') -> Dict[str, Any]:
         return {'version': 1, 'scores': []}
 
     try:
-        with open(filepath, 'r') as f:
+        with open(filepath, 'r', encoding='utf-8') as f:
             return json.load(f)
     except Exception as e:
         print(f"Error loading {filepath}: {e}")
@@ -47,38 +47,36 @@ def save_leaderboard(data: Dict[str, Any], filepath: str = 'data/leaderboard.jso
     """
     try:
         # Update generated timestamp
-        data['generated'] = int(datetime.now().timestamp() * 1000)
+        data['generated'] = time.time_ns() // 1_000_000
 
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2, sort_keys=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
         return True
     except Exception as e:
         print(f"Error saving {filepath}: {e}")
         return False
 
 
-def list_flagged_scores(
-    leaderboard: Dict[str, Any],
+def iter_flagged(
+    scores: Iterable[Dict[str, Any]],
     flag_threshold: int = 3
-) -> List[Dict[str, Any]]:
+) -> Iterator[Dict[str, Any]]:
     """
-    List all scores with flags above threshold
+    Lazily yield summaries of scores with flags above threshold
 
     Args:
-        leaderboard: Leaderboard data
+        scores: Leaderboard scores
         flag_threshold: Minimum flag count to consider flagged
 
-    Returns:
-        List of flagged scores
+    Yields:
+        Flagged score summaries
     """
-    flagged = []
-
-    for score in leaderboard.get('scores', []):
+    for score in scores:
         votes = score.get('votes', {})
         flags = votes.get('flags', 0)
 
         if flags >= flag_threshold:
-            flagged.append({
+            yield {
                 'rank': score.get('rank'),
                 'sessionHash': score.get('sessionHash'),
                 'userId': score.get('userId'),
@@ -88,9 +86,24 @@ def list_flagged_scores(
                 'stage': score.get('stage'),
                 'flags': flags,
                 'upvotes': votes.get('up', 0)
-            })
+            }
+
+
+def list_flagged_scores(
+    leaderboard: Dict[str, Any],
+    flag_threshold: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    List all scores with flags above threshold
 
-    return flagged
+    Args:
+        leaderboard: Leaderboard data
+        flag_threshold: Minimum flag count to consider flagged
+
+    Returns:
+        List of flagged scores
+    """
+    return list(iter_flagged(leaderboard.get('scores', []), flag_threshold))
 
 
 def print_flagged_scores(flagged: List[Dict[str, Any]]) -> None:
@@ -119,6 +132,17 @@ def print_flagged_scores(flagged: List[Dict[str, Any]]) -> None:
     print(f"\nTotal flagged scores: {len(flagged)}")
 
 
+def rerank_scores(leaderboard: Dict[str, Any]) -> None:
+    """
+    Reassign sequential ranks to the leaderboard scores
+
+    Args:
+        leaderboard: Leaderboard data (modified in place)
+    """
+    for i, score in enumerate(leaderboard.get('scores', []), 1):
+        score['rank'] = i
+
+
 def delete_score_by_hash(
     leaderboard: Dict[str, Any],
     session_hash: str
@@ -142,9 +166,7 @@ def delete_score_by_hash(
         if score.get('sessionHash') != session_hash
     ]
 
-    # Re-rank remaining scores
-    for i, score in enumerate(leaderboard['scores'], 1):
-        score['rank'] = i
+    rerank_scores(leaderboard)
 
     return len(leaderboard['scores']) < original_count
 
@@ -162,17 +184,44 @@ def delete_replay_file(session_hash: str, replay_dir: str = 'data/replays') -> b
     """
     filepath = os.path.join(replay_dir, f"{session_hash}.json")
 
-    if not os.path.exists(filepath):
-        return False
-
     try:
         os.remove(filepath)
         return True
+    except FileNotFoundError:
+        return False
     except Exception as e:
         print(f"Error deleting replay file: {e}")
         return False
 
 
+def delete_replay_files(session_hashes: Set[str], replay_dir: str = 'data/replays') -> int:
+    """
+    Delete replay files for many session hashes
+
+    Unlinks each file directly; the replay directory holds every score ever
+    accepted, so scanning it would cost far more than the deletes.
+
+    Args:
+        session_hashes: Session hashes whose replays should be removed
+        replay_dir: Directory containing replay files
+
+    Returns:
+        Number of files deleted
+    """
+    deleted = 0
+
+    for session_hash in session_hashes:
+        try:
+            os.unlink(os.path.join(replay_dir, f"{session_hash}.json"))
+            deleted += 1
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error deleting replay file: {e}")
+
+    return deleted
+
+
 def interactive_moderation(
     leaderboard: Dict[str, Any],
     flag_threshold: int = 3
@@ -184,90 +233,139 @@ def interactive_moderation(
         leaderboard: Leaderboard data
         flag_threshold: Minimum flag count
     """
-    flagged = list_flagged_scores(leaderboard, flag_threshold)
-
-    if not flagged:
-        print("No scores need moderation.")
-        return
+    # Scans keyed by threshold; the leaderboard only changes right before we exit
+    flagged_cache: Dict[int, List[Dict[str, Any]]] = {}
 
-    print_flagged_scores(flagged)
+    while True:
+        if flag_threshold not in flagged_cache:
+            flagged_cache[flag_threshold] = list_flagged_scores(leaderboard, flag_threshold)
+        flagged = flagged_cache[flag_threshold]
 
-    print("\n" + "="*80)
-    print("MODERATION ACTIONS")
-    print("="*80)
-    print("\nOptions:")
-    print("  1. Delete a score by session hash")
-    print("  2. Change flag threshold")
-    print("  3. Exit without changes")
+        if not flagged:
+            print("No scores need moderation.")
+            return
 
-    choice = input("\nEnter choice (1-3): ").strip()
+        print_flagged_scores(flagged)
+
+        print("\n" + "="*80)
+        print("MODERATION ACTIONS")
+        print("="*80)
+        print("\nOptions:")
+        print("  1. Delete a score by session hash")
+        print("  2. Change flag threshold")
+        print("  3. Exit without changes")
+
+        choice = input("\nEnter choice (1-3): ").strip()
+
+        if choice == '1':
+            session_hash = input("Enter session hash to delete (or 'cancel'): ").strip()
+
+            if session_hash.lower() == 'cancel':
+                print("Cancelled.")
+                return
+
+            # Confirm deletion
+            score_to_delete = None
+            for score in flagged:
+                if score['sessionHash'] == session_hash:
+                    score_to_delete = score
+                    break
+
+            if not score_to_delete:
+                print(f"Error: Session hash '{session_hash}' not found in flagged scores.")
+                return
+
+            print(f"\nDeleting score:")
+            print(f"  User: {score_to_delete['initials']}")
+            print(f"  Performance: {score_to_delete['wpm']} WPM")
+            print(f"  Flags: {score_to_delete['flags']}")
+
+            confirm = input("\nConfirm deletion? (yes/no): ").strip().lower()
+
+            if confirm == 'yes':
+                if delete_score_by_hash(leaderboard, session_hash):
+                    print("✓ Score deleted from leaderboard")
+
+                    # Also delete replay file
+                    if delete_replay_file(session_hash):
+                        print("✓ Replay file deleted")
+                    else:
+                        print("⚠ Replay file not found or couldn't be deleted")
+
+                    # Save updated leaderboard
+                    if save_leaderboard(leaderboard):
+                        print("✓ Leaderboard saved")
+                    else:
+                        print("✗ Failed to save leaderboard")
+                else:
+                    print("✗ Failed to delete score")
+            else:
+                print("Deletion cancelled.")
 
-    if choice == '1':
-        session_hash = input("Enter session hash to delete (or 'cancel'): ").strip()
+        elif choice == '2':
+            new_threshold = input(f"Enter new flag threshold (current: {flag_threshold}): ").strip()
 
-        if session_hash.lower() == 'cancel':
-            print("Cancelled.")
-            return
+            try:
+                new_threshold = int(new_threshold)
+                if new_threshold < 1:
+                    print("Threshold must be at least 1")
+                else:
+                    # Rescan with the new threshold
+                    flag_threshold = new_threshold
+                    continue
+            except ValueError:
+                print("Invalid threshold value")
 
-        # Confirm deletion
-        score_to_delete = None
-        for score in flagged:
-            if score['sessionHash'] == session_hash:
-                score_to_delete = score
-                break
+        else:
+            print("Exiting without changes.")
 
-        if not score_to_delete:
-            print(f"Error: Session hash '{session_hash}' not found in flagged scores.")
-            return
+        return
 
-        print(f"\nDeleting score:")
-        print(f"  User: {score_to_delete['initials']}")
-        print(f"  Performance: {score_to_delete['wpm']} WPM")
-        print(f"  Flags: {score_to_delete['flags']}")
 
-        confirm = input("\nConfirm deletion? (yes/no): ").strip().lower()
+def delete_flagged_scores(
+    leaderboard: Dict[str, Any],
+    flagged: Iterable[Dict[str, Any]],
+    auto_save: bool = False
+) -> int:
+    """
+    Delete a pre-filtered set of scores without prompting (for scripts/CI)
 
-        if confirm == 'yes':
-            if delete_score_by_hash(leaderboard, session_hash):
-                print("✓ Score deleted from leaderboard")
+    Args:
+        leaderboard: Leaderboard data (modified in place)
+        flagged: Scores to delete (e.g. from iter_flagged)
+        auto_save: Whether to save automatically
 
-                # Also delete replay file
-                if delete_replay_file(session_hash):
-                    print("✓ Replay file deleted")
-                else:
-                    print("⚠ Replay file not found or couldn't be deleted")
+    Returns:
+        Number of scores deleted
+    """
+    # Remove every flagged score in a single pass, then re-rank once
+    hashes_to_delete = {score['sessionHash'] for score in flagged}
+    scores = leaderboard.get('scores', [])
+    leaderboard['scores'] = [
+        score for score in scores
+        if score.get('sessionHash') not in hashes_to_delete
+    ]
+    deleted = len(scores) - len(leaderboard['scores'])
+    rerank_scores(leaderboard)
 
-                # Save updated leaderboard
-                if save_leaderboard(leaderboard):
-                    print("✓ Leaderboard saved")
-                else:
-                    print("✗ Failed to save leaderboard")
-            else:
-                print("✗ Failed to delete score")
-        else:
-            print("Deletion cancelled.")
+    delete_replay_files(hashes_to_delete)
 
-    elif choice == '2':
-        new_threshold = input(f"Enter new flag threshold (current: {flag_threshold}): ").strip()
+    print(f"✓ Deleted {deleted} scores")
 
-        try:
-            new_threshold = int(new_threshold)
-            if new_threshold < 1:
-                print("Threshold must be at least 1")
-            else:
-                # Re-run with new threshold
-                interactive_moderation(leaderboard, new_threshold)
-        except ValueError:
-            print("Invalid threshold value")
+    if auto_save and deleted > 0:
+        if save_leaderboard(leaderboard):
+            print("✓ Leaderboard saved")
+        else:
+            print("✗ Failed to save leaderboard")
 
-    else:
-        print("Exiting without changes.")
+    return deleted
 
 
 def batch_delete_flagged(
     leaderboard: Dict[str, Any],
     flag_threshold: int = 5,
-    auto_save: bool = False
+    auto_save: bool = False,
+    assume_yes: bool = False
 ) -> int:
     """
     Batch delete all scores with flags above threshold
@@ -276,6 +374,7 @@ def batch_delete_flagged(
         leaderboard: Leaderboard data (modified in place)
         flag_threshold: Minimum flag count for auto-deletion
         auto_save: Whether to save automatically
+        assume_yes: Skip the confirmation prompt
 
     Returns:
         Number of scores deleted
@@ -291,27 +390,14 @@ def batch_delete_flagged(
     for score in flagged:
         print(f"  - {score['initials']}: {score['wpm']} WPM, {score['flags']} flags")
 
-    confirm = input(f"\nDelete all {len(flagged)} scores? (yes/no): ").strip().lower()
+    if not assume_yes:
+        confirm = input(f"\nDelete all {len(flagged)} scores? (yes/no): ").strip().lower()
 
-    if confirm != 'yes':
-        print("Batch deletion cancelled.")
-        return 0
+        if confirm != 'yes':
+            print("Batch deletion cancelled.")
+            return 0
 
-    deleted = 0
-    for score in flagged:
-        if delete_score_by_hash(leaderboard, score['sessionHash']):
-            deleted += 1
-            delete_replay_file(score['sessionHash'])
-
-    print(f"✓ Deleted {deleted} scores")
-
-    if auto_save and deleted > 0:
-        if save_leaderboard(leaderboard):
-            print("✓ Leaderboard saved")
-        else:
-            print("✗ Failed to save leaderboard")
-
-    return deleted
+    return delete_flagged_scores(leaderboard, flagged, auto_save)
 
 
 def main():
@@ -327,6 +413,7 @@ def main():
             print("  python moderate_scores.py           # Interactive mode")
             print("  python moderate_scores.py --list    # List flagged scores")
             print("  python moderate_scores.py --batch   # Batch delete flagged scores")
+            print("  python moderate_scores.py --batch [threshold] --yes  # Batch delete without prompting")
             print("  python moderate_scores.py --help    # Show this help")
             return
 
@@ -337,15 +424,19 @@ def main():
             print_flagged_scores(flagged)
 
         elif sys.argv[1] == '--batch':
+            args = sys.argv[2:]
+            assume_yes = '--yes' in args
+            args = [arg for arg in args if arg != '--yes']
+
             threshold = 5
-            if len(sys.argv) > 2:
+            if args:
                 try:
-                    threshold = int(sys.argv[2])
+                    threshold = int(args[0])
                 except ValueError:
-                    print(f"Invalid threshold: {sys.argv[2]}")
+                    print(f"Invalid threshold: {args[0]}")
                     return
 
-            batch_delete_flagged(leaderboard, threshold, auto_save=True)
+            batch_delete_flagged(leaderboard, threshold, auto_save=True, assume_yes=assume_yes)
 
         else:
             print(f"Unknown option: {sys.argv[1]}")
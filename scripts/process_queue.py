@@ -5,11 +5,16 @@ Fetches submissions from Cloudflare KV, validates them, and generates static JSO
 Run by GitHub Actions every 15 minutes
 """
 
+import hashlib
 import json
+import operator
 import os
+import ssl
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional, Set
 
 # Import our modules
 from cloudflare_kv import get_client_from_env
@@ -19,10 +24,22 @@ from generate_static import (
     generate_feedback,
     generate_replay_file,
     atomic_write_json,
+    content_unchanged,
+    items_digest,
     load_json_safe
 )
 
 
+# Defaults for the session fields copied onto score objects and replay metadata
+SESSION_DEFAULTS = {'stage': 0, 'duration': 0}
+STATS_DEFAULTS = {'wpm': 0, 'accuracy': 0}
+_get_session_fields = operator.itemgetter('stage', 'duration')
+_get_stats_fields = operator.itemgetter('wpm', 'accuracy')
+
+# Worker threads used to write replay files (local disk I/O, not KV requests)
+REPLAY_WRITE_WORKERS = 8
+
+
 def fetch_queue_items(kv_client, prefix: str = "queue:") -> List[tuple[str, Dict]]:
     """
     Fetch all queue items from Cloudflare KV
@@ -39,9 +56,11 @@ def fetch_queue_items(kv_client, prefix: str = "queue:") -> List[tuple[str, Dict
     keys = kv_client.list_keys(prefix=prefix)
     print(f"Found {len(keys)} queue items")
 
+    values = kv_client.get_values(keys)
+
     items = []
     for key in keys:
-        value = kv_client.get_value(key)
+        value = values.get(key)
         if value:
             items.append((key, value))
         else:
@@ -66,9 +85,11 @@ def fetch_feedback_items(kv_client, prefix: str = "feedback:") -> List[tuple[str
     keys = kv_client.list_keys(prefix=prefix)
     print(f"Found {len(keys)} feedback items")
 
+    values = kv_client.get_values(keys)
+
     items = []
     for key in keys:
-        value = kv_client.get_value(key)
+        value = values.get(key)
         if value:
             items.append((key, value))
         else:
@@ -81,6 +102,10 @@ def fetch_vote_counts(kv_client, session_hashes: List[str]) -> Dict[str, Dict[st
     """
     Fetch and aggregate vote counts for given session hashes
 
+    Reads the per-hash 'vote-count:' aggregates maintained by the Worker in one
+    bulk read. The Worker seeds an aggregate on the first vote it records, so a
+    missing aggregate means no votes yet.
+
     Args:
         kv_client: CloudflareKV client instance
         session_hashes: List of session hashes to get votes for
@@ -88,27 +113,19 @@ def fetch_vote_counts(kv_client, session_hashes: List[str]) -> Dict[str, Dict[st
     Returns:
         Dictionary mapping session hash to vote counts
     """
-    vote_counts = {}
-
-    for hash_val in session_hashes:
-        # Fetch all votes for this hash
-        vote_keys = kv_client.list_keys(prefix=f"vote:{hash_val}:")
+    if not session_hashes:
+        return {}
 
-        up_votes = 0
-        flag_votes = 0
-
-        for key in vote_keys:
-            vote_data = kv_client.get_value(key)
-            if vote_data and isinstance(vote_data, dict):
-                vote_type = vote_data.get('voteType')
-                if vote_type == 'up':
-                    up_votes += 1
-                elif vote_type == 'flag':
-                    flag_votes += 1
+    aggregates = kv_client.get_values([f"vote-count:{hash_val}" for hash_val in session_hashes])
 
+    vote_counts = {}
+    for hash_val in session_hashes:
+        aggregate = aggregates.get(f"vote-count:{hash_val}")
+        if not isinstance(aggregate, dict):
+            aggregate = {}
         vote_counts[hash_val] = {
-            'up': up_votes,
-            'flags': flag_votes
+            'up': aggregate.get('up', 0),
+            'flags': aggregate.get('flags', 0)
         }
 
     return vote_counts
@@ -118,6 +135,9 @@ def fetch_feedback_vote_counts(kv_client, feedback_ids: List[str]) -> Dict[str,
     """
     Fetch and aggregate feedback vote counts
 
+    Reads the 'feedback-vote-count:' aggregates in one bulk read; feedback
+    without an aggregate has no votes yet.
+
     Args:
         kv_client: CloudflareKV client instance
         feedback_ids: List of feedback IDs to get votes for
@@ -125,16 +145,145 @@ def fetch_feedback_vote_counts(kv_client, feedback_ids: List[str]) -> Dict[str,
     Returns:
         Dictionary mapping feedback ID to vote count
     """
-    vote_counts = {}
+    if not feedback_ids:
+        return {}
+
+    aggregates = kv_client.get_values([f"feedback-vote-count:{feedback_id}" for feedback_id in feedback_ids])
 
+    vote_counts = {}
     for feedback_id in feedback_ids:
-        # Fetch all votes for this feedback
-        vote_keys = kv_client.list_keys(prefix=f"feedback-vote:{feedback_id}:")
-        vote_counts[feedback_id] = len(vote_keys)
+        aggregate = aggregates.get(f"feedback-vote-count:{feedback_id}")
+        vote_counts[feedback_id] = aggregate.get('votes', 0) if isinstance(aggregate, dict) else 0
 
     return vote_counts
 
 
+def delete_processed_keys(kv_client, keys: Iterable[str]) -> None:
+    """
+    Remove processed items from the queue with a single bulk delete
+
+    Falls back to concurrent per-key deletes if the bulk request fails.
+
+    Args:
+        kv_client: CloudflareKV client instance
+        keys: Queue keys to delete
+    """
+    keys = list(keys)
+    if not keys:
+        return
+
+    if kv_client.bulk_delete(keys):
+        print(f"  ✓ Deleted {len(keys)} item(s) from queue")
+        return
+
+    print("  ⚠ Bulk delete failed, deleting keys individually")
+    for key, deleted in kv_client.map_delete(keys).items():
+        if deleted:
+            print(f"  ✓ Deleted {key} from queue")
+        else:
+            print(f"  ⚠ Failed to delete {key}")
+
+
+def load_leaderboard_hashes(filepath: str = 'data/leaderboard.json') -> Set[str]:
+    """
+    Load the session hashes currently on the leaderboard
+
+    Streams the scores array rather than keeping the whole document around.
+
+    Args:
+        filepath: Path to leaderboard.json
+
+    Returns:
+        Set of session hashes
+    """
+    return {
+        score['sessionHash']
+        for score in load_json_safe(filepath, stream_key='scores')
+        if isinstance(score, dict) and 'sessionHash' in score
+    }
+
+
+def load_existing_hashes(
+    seen_path: str = 'data/seen_hashes.txt',
+    leaderboard_path: str = 'data/leaderboard.json'
+) -> Set[str]:
+    """
+    Load every session hash accepted so far, for duplicate checks
+
+    Reads the append-only seen_hashes.txt index (one hash per line), falling
+    back to the leaderboard itself until the index exists.
+
+    Args:
+        seen_path: Path to the seen-hashes index
+        leaderboard_path: Path to leaderboard.json
+
+    Returns:
+        Set of session hashes
+    """
+    try:
+        with open(seen_path, 'r', encoding='utf-8') as f:
+            return set(f.read().split())
+    except FileNotFoundError:
+        return load_leaderboard_hashes(leaderboard_path)
+
+
+def append_seen_hashes(
+    session_hashes: List[str],
+    seen_path: str = 'data/seen_hashes.txt',
+    leaderboard_path: str = 'data/leaderboard.json'
+) -> bool:
+    """
+    Record newly accepted session hashes in the seen-hashes index
+
+    The first call seeds the index with the hashes already on the leaderboard.
+
+    Args:
+        session_hashes: Newly accepted session hashes
+        seen_path: Path to the seen-hashes index
+        leaderboard_path: Path to leaderboard.json
+
+    Returns:
+        True if successful
+    """
+    lines = list(session_hashes)
+    if not lines:
+        return True
+
+    try:
+        if not os.path.exists(seen_path):
+            lines = sorted(load_leaderboard_hashes(leaderboard_path).union(lines))
+
+        with open(seen_path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        return True
+    except Exception as e:
+        print(f"Error writing {seen_path}: {e}")
+        return False
+
+
+def write_replay_files(
+    scores: List[Dict[str, Any]],
+    replay_sources: Dict[str, tuple[Dict, Dict]]
+) -> None:
+    """
+    Write replay files in parallel, with each score's vote counts
+
+    Args:
+        scores: Valid score objects with vote counts
+        replay_sources: Session hash -> (session_data, metadata)
+    """
+    def write_replay(score: Dict[str, Any]) -> bool:
+        session_data, metadata = replay_sources[score['sessionHash']]
+        return generate_replay_file(session_data, metadata, score['votes'])
+
+    with ThreadPoolExecutor(max_workers=REPLAY_WRITE_WORKERS) as executor:
+        for score, written in zip(scores, executor.map(write_replay, scores)):
+            if written:
+                print(f"  ✓ Generated replay file for {score['sessionHash']}")
+            else:
+                print(f"  ⚠ Failed to generate replay file for {score['sessionHash']}")
+
+
 def process_score_submissions(
     queue_items: List[tuple[str, Dict]],
     kv_client
@@ -150,11 +299,14 @@ def process_score_submissions(
         List of valid score objects
     """
     valid_scores = []
-    processed_keys = []
+    processed_keys = set()
+    replay_sources = {}  # session hash -> (session_data, metadata)
+
+    # Existing hashes for duplicate checks, loaded on the first valid submission
+    existing_hashes = None
 
-    # Load existing leaderboard to check for duplicates
-    existing_leaderboard = load_json_safe('data/leaderboard.json', {'scores': []})
-    existing_hashes = {score['sessionHash'] for score in existing_leaderboard.get('scores', [])}
+    # Fallback timestamp for submissions without one, taken once per batch
+    now_ms = time.time_ns() // 1_000_000
 
     for key, submission in queue_items:
         print(f"\nProcessing {key}...")
@@ -171,52 +323,51 @@ def process_score_submissions(
 
         if not is_valid:
             print(f"  ✗ Validation failed: {errors}")
-            processed_keys.append(key)  # Mark for deletion anyway
+            processed_keys.add(key)  # Mark for deletion anyway
             continue
 
         session_hash = submission.get('sessionHash')
 
         # Check for duplicate
+        if existing_hashes is None:
+            existing_hashes = load_existing_hashes()
+
         if session_hash in existing_hashes:
             print(f"  ✗ Duplicate session hash: {session_hash}")
-            processed_keys.append(key)
+            processed_keys.add(key)
             continue
 
         # Extract score data
         session_data = submission.get('sessionData', {})
-        stats = session_data.get('stats', {})
+        stage, duration = _get_session_fields({**SESSION_DEFAULTS, **session_data})
+        wpm, accuracy = _get_stats_fields({**STATS_DEFAULTS, **session_data.get('stats', {})})
 
         score_obj = {
             'sessionHash': session_hash,
             'userId': submission.get('userId'),
             'initials': submission.get('initials'),
-            'wpm': stats.get('wpm', 0),
-            'accuracy': stats.get('accuracy', 0),
-            'stage': session_data.get('stage', 0),
-            'timestamp': submission.get('timestamp', int(datetime.now().timestamp() * 1000)),
+            'wpm': wpm,
+            'accuracy': accuracy,
+            'stage': stage,
+            'timestamp': submission.get('timestamp', now_ms),
             'votes': {'up': 0, 'flags': 0},  # Will be updated with actual counts
             'replayUrl': f'data/replays/{session_hash}.json'
         }
 
         valid_scores.append(score_obj)
-        processed_keys.append(key)
+        processed_keys.add(key)
         existing_hashes.add(session_hash)  # Prevent duplicates within this batch
 
-        # Generate replay file
-        metadata = {
+        # Replay files are written once vote counts are known
+        replay_sources[session_hash] = (session_data, {
             'userId': score_obj['userId'],
             'initials': score_obj['initials'],
             'wpm': score_obj['wpm'],
             'accuracy': score_obj['accuracy'],
             'stage': score_obj['stage'],
-            'duration': session_data.get('duration', 0),
+            'duration': duration,
             'timestamp': score_obj['timestamp']
-        }
-
-        if generate_replay_file(session_data, metadata):
-            print(f"  ✓ Generated replay file for {session_hash}")
-        else:
-            print(f"  ⚠ Failed to generate replay file for {session_hash}")
+        })
 
     # Fetch vote counts for all valid scores
     if valid_scores:
@@ -228,12 +379,10 @@ def process_score_submissions(
             if score['sessionHash'] in vote_counts:
                 score['votes'] = vote_counts[score['sessionHash']]
 
+        write_replay_files(valid_scores, replay_sources)
+
     # Delete processed items from queue
-    for key in processed_keys:
-        if kv_client.delete_key(key):
-            print(f"  ✓ Deleted {key} from queue")
-        else:
-            print(f"  ⚠ Failed to delete {key}")
+    delete_processed_keys(kv_client, processed_keys)
 
     print(f"\nProcessed {len(valid_scores)} valid scores")
     return valid_scores
@@ -256,6 +405,9 @@ def process_feedback_submissions(
     valid_feedback = []
     processed_keys = []
 
+    # Fallback timestamp for submissions without one, taken once per batch
+    now_ms = time.time_ns() // 1_000_000
+
     for key, feedback in feedback_items:
         print(f"\nProcessing feedback {key}...")
 
@@ -276,7 +428,7 @@ def process_feedback_submissions(
             'type': feedback.get('type', 'feedback'),
             'description': feedback.get('description'),
             'userId': feedback.get('userId'),
-            'timestamp': feedback.get('timestamp', int(datetime.now().timestamp() * 1000)),
+            'timestamp': feedback.get('timestamp', now_ms),
             'votes': 0,  # Will be updated with actual count
             'status': feedback.get('status', 'open')
         }
@@ -303,11 +455,7 @@ def process_feedback_submissions(
                 feedback['votes'] = vote_counts[feedback['id']]
 
     # Delete processed items from queue
-    for key in processed_keys:
-        if kv_client.delete_key(key):
-            print(f"  ✓ Deleted {key} from queue")
-        else:
-            print(f"  ⚠ Failed to delete {key}")
+    delete_processed_keys(kv_client, processed_keys)
 
     print(f"\nProcessed {len(valid_feedback)} feedback items")
     return valid_feedback
@@ -318,8 +466,10 @@ def main():
     print("="*60)
     print("LEADERBOARD QUEUE PROCESSOR")
     print(f"Started at: {datetime.now().isoformat()}")
+    print(f"Hashing with: {ssl.OPENSSL_VERSION}")  # hashlib's SHA-256 (SHA-NI capable from 1.1.1)
     print("="*60)
 
+    kv_client = None
     try:
         # Initialize Cloudflare KV client
         print("\nInitializing Cloudflare KV client...")
@@ -337,9 +487,13 @@ def main():
         # Generate/update leaderboard
         if new_scores or not os.path.exists('data/leaderboard.json'):
             print("\nGenerating leaderboard...")
-            leaderboard = generate_leaderboard(new_scores)
+            leaderboard_exists = os.path.exists('data/leaderboard.json')
+            existing_digest = hashlib.sha256()  # Fed the scores streamed from disk
+            leaderboard = generate_leaderboard(new_scores, existing_hasher=existing_digest)
 
-            if atomic_write_json('data/leaderboard.json', leaderboard):
+            if leaderboard_exists and items_digest(leaderboard['scores']) == existing_digest.digest():
+                print("✓ Leaderboard unchanged, skipping write")
+            elif atomic_write_json('data/leaderboard.json', leaderboard):
                 print(f"✓ Leaderboard updated with {len(leaderboard['scores'])} total scores")
             else:
                 print("✗ Failed to write leaderboard.json")
@@ -347,6 +501,17 @@ def main():
         else:
             print("\nNo new scores to process")
 
+        # Remember accepted hashes (even ones that missed the top scores) for duplicate checks
+        if new_scores:
+            if append_seen_hashes([score['sessionHash'] for score in new_scores]):
+                print(f"✓ Recorded {len(new_scores)} new session hash(es)")
+            else:
+                print("⚠ Failed to update seen_hashes.txt")
+
+        # stdout is block-buffered under CI (a pipe); flush at phase boundaries so
+        # the job log still shows progress per phase
+        sys.stdout.flush()
+
         # Fetch and process feedback items
         feedback_items = fetch_feedback_items(kv_client, prefix="feedback:")
 
@@ -359,7 +524,9 @@ def main():
             print("\nGenerating feedback list...")
             feedback = generate_feedback(new_feedback)
 
-            if atomic_write_json('data/feedback.json', feedback):
+            if content_unchanged('data/feedback.json', feedback):
+                print("✓ Feedback unchanged, skipping write")
+            elif atomic_write_json('data/feedback.json', feedback):
                 print(f"✓ Feedback updated with {len(feedback['items'])} total items")
             else:
                 print("✗ Failed to write feedback.json")
@@ -367,6 +534,8 @@ def main():
         else:
             print("\nNo new feedback to process")
 
+        sys.stdout.flush()
+
         print("\n" + "="*60)
         print("PROCESSING COMPLETE")
         print(f"Finished at: {datetime.now().isoformat()}")
@@ -374,10 +543,16 @@ def main():
 
     except Exception as e:
         print(f"\n✗ Fatal error: {e}")
+        sys.stdout.flush()  # Keep the log ahead of the traceback on stderr
         import traceback
         traceback.print_exc()
         sys.exit(1)
 
+    finally:
+        if kv_client is not None:
+            kv_client.close()
+        sys.stdout.flush()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,13 +2,42 @@
 """
 Session Hash Validation
 Recalculates SHA-256 hash from session data to verify integrity
-No external dependencies - uses only standard library
+Uses orjson when installed, otherwise only the standard library
 """
 
 import hashlib
+import hmac
 import json
+import operator
+import re
 from typing import Dict, List, Any
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Keystroke fields covered by the session hash
+KEYSTROKE_FIELDS = ('key', 'timestamp', 'wordIndex')
+_get_keystroke_fields = operator.itemgetter(*KEYSTROKE_FIELDS)
+
+# Upper bound on keystrokes per session, so oversized submissions can't burn CPU
+MAX_KEYSTROKES = 100000
+
+# Keystroke errors reported before validation gives up on the rest
+MAX_KEYSTROKE_ERRORS = 10
+
+# Compiled once; is_valid_uuid runs for every queued submission
+_UUIDV4_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$')
+
+# Same rule as the client and worker (/^[A-Z]{3}$/)
+_INITIALS_RE = re.compile(r'[A-Z]{3}')
+
+# Output where orjson and json.dumps can disagree: bytes json.dumps would escape,
+# exponent floats (1e16 vs 1e+16) and tiny floats (0.00001 vs 1e-05)
+_ORJSON_MISMATCH_RE = re.compile(rb'[^\x20-\x7e]|\d[eE][-+\d]|0\.0000')
+
 
 def extract_deterministic_data(session_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -25,30 +54,54 @@ def extract_deterministic_data(session_data: Dict[str, Any]) -> Dict[str, Any]:
         'seed': session_data.get('seed'),
         'stage': session_data.get('stage'),
         'words': [],
-        'keystrokes': []
+        'keystrokes': {field: [] for field in KEYSTROKE_FIELDS}
     }
 
     # Extract word texts in sorted order
     words = session_data.get('words', [])
     if isinstance(words, list):
-        word_texts = [w.get('text', '') for w in words if w.get('text')]
-        deterministic['words'] = sorted(word_texts)  # Sort alphabetically
+        word_texts = [text for w in words if (text := w.get('text'))]
+        word_texts.sort()  # Sort alphabetically (by code point, same order as UTF-8 bytes)
+        deterministic['words'] = word_texts
 
-    # Extract keystrokes with deterministic fields only
+    # Extract deterministic keystroke fields as parallel arrays (struct-of-arrays),
+    # so field names aren't repeated for every keystroke
     keystrokes = session_data.get('keystrokes', [])
     if isinstance(keystrokes, list):
-        deterministic['keystrokes'] = [
-            {
-                'key': k.get('key'),
-                'timestamp': k.get('timestamp'),
-                'wordIndex': k.get('wordIndex')
-            }
-            for k in keystrokes
-        ]
+        deterministic['keystrokes'] = {
+            field: [k.get(field) for k in keystrokes]
+            for field in KEYSTROKE_FIELDS
+        }
 
     return deterministic
 
 
+def canonical_json(data: Any) -> bytes:
+    """
+    Encode data as compact, key-sorted JSON for hashing
+
+    Uses orjson when available, but only when its output is byte-identical to
+    json.dumps (which escapes non-ASCII and formats some floats differently);
+    otherwise falls back to json.dumps so hashes never depend on the encoder.
+
+    Args:
+        data: Data to encode
+
+    Returns:
+        UTF-8 encoded JSON
+    """
+    if orjson is not None:
+        try:
+            payload = orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            payload = None
+
+        if payload is not None and not _ORJSON_MISMATCH_RE.search(payload):
+            return payload
+
+    return json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
 def calculate_hash(session_data: Dict[str, Any]) -> str:
     """
     Calculate SHA-256 hash of session data
@@ -62,11 +115,11 @@ def calculate_hash(session_data: Dict[str, Any]) -> str:
     # Extract deterministic data
     deterministic_data = extract_deterministic_data(session_data)
 
-    # Create stable JSON string (no indentation, no spaces)
-    json_string = json.dumps(deterministic_data, separators=(',', ':'), sort_keys=True)
+    # Create stable JSON bytes (no indentation, no spaces)
+    payload = canonical_json(deterministic_data)
 
     # Calculate SHA-256 hash
-    hash_object = hashlib.sha256(json_string.encode('utf-8'))
+    hash_object = hashlib.sha256(payload)
     return hash_object.hexdigest()
 
 
@@ -86,19 +139,21 @@ def verify_hash(session_data: Dict[str, Any], expected_hash: str) -> bool:
 
     try:
         calculated_hash = calculate_hash(session_data)
-        # Compare case-insensitively
-        return calculated_hash.lower() == expected_hash.lower()
+        # calculate_hash returns lowercase hex; compare in constant time
+        return hmac.compare_digest(calculated_hash, expected_hash.lower())
     except Exception as e:
         print(f"Hash verification error: {e}")
         return False
 
 
-def validate_session_data(session_data: Dict[str, Any]) -> tuple[bool, List[str]]:
+def validate_session_data(session_data: Dict[str, Any], fast_fail: bool = True) -> tuple[bool, List[str]]:
     """
     Validate session data structure and values
 
     Args:
         session_data: Session data to validate
+        fast_fail: Stop checking keystrokes after MAX_KEYSTROKE_ERRORS problems
+            (one bad keystroke already invalidates the submission)
 
     Returns:
         Tuple of (is_valid, list_of_errors)
@@ -145,8 +200,23 @@ def validate_session_data(session_data: Dict[str, Any]) -> tuple[bool, List[str]
             errors.append("Keystrokes must be an array")
         elif len(keystrokes) == 0:
             errors.append("Keystrokes array cannot be empty")
+        elif len(keystrokes) > MAX_KEYSTROKES:
+            errors.append(f"Too many keystrokes ({len(keystrokes)}, max {MAX_KEYSTROKES})")
         else:
+            first_error = len(errors)
             for i, keystroke in enumerate(keystrokes):
+                if fast_fail and len(errors) - first_error >= MAX_KEYSTROKE_ERRORS:
+                    errors.append("Too many invalid keystrokes, stopped checking")
+                    break
+
+                # Fast path: one C-level lookup for well-formed keystrokes
+                try:
+                    key, timestamp, word_index = _get_keystroke_fields(keystroke)
+                    if key and timestamp is not None and word_index is not None:
+                        continue
+                except (KeyError, TypeError):
+                    pass
+
                 if not isinstance(keystroke, dict):
                     errors.append(f"Keystroke {i} must be an object")
                     continue
@@ -188,42 +258,38 @@ def validate_submission(submission: Dict[str, Any]) -> tuple[bool, List[str]]:
     Returns:
         Tuple of (is_valid, list_of_errors)
     """
-    errors = []
+    # Cheapest checks first; SHA-256 over the keystrokes only runs once everything else passes
+    user_id = submission.get('userId')
+    if not user_id:
+        return False, ["Missing userId"]
+    if not is_valid_uuid(user_id):
+        return False, ["Invalid userId format (must be UUIDv4)"]
+
+    initials = submission.get('initials')
+    if not initials:
+        return False, ["Missing initials"]
+    if not (isinstance(initials, str) and _INITIALS_RE.fullmatch(initials)):
+        return False, ["Initials must be exactly 3 uppercase letters"]
 
-    # Check for session data and hash
     session_data = submission.get('sessionData')
     session_hash = submission.get('sessionHash')
 
     if not session_data:
-        errors.append("Missing sessionData")
-        return False, errors
+        return False, ["Missing sessionData"]
 
     if not session_hash:
-        errors.append("Missing sessionHash")
-        return False, errors
-
-    # Validate session data structure
-    is_valid, data_errors = validate_session_data(session_data)
-    errors.extend(data_errors)
-
-    # Verify hash if data is structurally valid
-    if is_valid:
-        if not verify_hash(session_data, session_hash):
-            errors.append("Session hash does not match session data")
+        return False, ["Missing sessionHash"]
 
-    # Check user identity fields
-    if not submission.get('userId'):
-        errors.append("Missing userId")
-    elif not is_valid_uuid(submission.get('userId')):
-        errors.append("Invalid userId format (must be UUIDv4)")
+    # Validate session data structure (includes the MAX_KEYSTROKES cap)
+    is_valid, errors = validate_session_data(session_data)
+    if not is_valid:
+        return False, errors
 
-    initials = submission.get('initials')
-    if not initials:
-        errors.append("Missing initials")
-    elif not isinstance(initials, str) or len(initials) != 3 or not initials.isupper():
-        errors.append("Initials must be exactly 3 uppercase letters")
+    # Verify hash last, on structurally valid data only
+    if not verify_hash(session_data, session_hash):
+        return False, ["Session hash does not match session data"]
 
-    return len(errors) == 0, errors
+    return True, []
 
 
 def is_valid_uuid(uuid_string: str) -> bool:
@@ -240,9 +306,7 @@ def is_valid_uuid(uuid_string: str) -> bool:
         return False
 
     # Basic UUIDv4 pattern check
-    import re
-    pattern = r'^[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$'
-    return bool(re.match(pattern, uuid_string.lower()))
+    return bool(_UUIDV4_RE.match(uuid_string.lower()))
 
 
 def test_validation():
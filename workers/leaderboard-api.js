@@ -157,6 +157,37 @@ async function checkRateLimit(env, userId, limitType, maxRequests, windowMs) {
   return { allowed: true };
 }
 
+/**
+ * Helper function to list every key under a prefix (follows list cursors)
+ */
+async function listAllKeys(env, prefix) {
+  const names = [];
+  let cursor;
+
+  do {
+    const page = await env.LEADERBOARD_QUEUE.list({ prefix, cursor });
+    for (const key of page.keys) {
+      names.push(key.name);
+    }
+    cursor = page.list_complete ? null : page.cursor;
+  } while (cursor);
+
+  return names;
+}
+
+/**
+ * Helper function to bump a vote aggregate
+ * Aggregates let the queue processor read vote totals with one KV read per
+ * target instead of listing and reading every vote. A missing aggregate is
+ * seeded from the votes already stored. KV has no atomic increment, so
+ * simultaneous votes on the same target can race.
+ */
+async function incrementVoteCount(env, countKey, field, seedCounts) {
+  const counts = await env.LEADERBOARD_QUEUE.get(countKey, { type: 'json' }) || await seedCounts();
+  counts[field] = (counts[field] || 0) + 1;
+  await env.LEADERBOARD_QUEUE.put(countKey, JSON.stringify(counts));
+}
+
 /**
  * Handle score submission
  * T018-T022, T091-T092: Validate and queue score submissions
@@ -336,6 +367,21 @@ async function handleVoteSubmission(request, env) {
 
     await env.LEADERBOARD_QUEUE.put(voteKey, JSON.stringify(voteData));
 
+    // Update the aggregate read by the queue processor. When seeding, skip the
+    // vote just stored since KV listings are eventually consistent.
+    const countField = body.voteType === 'up' ? 'up' : 'flags';
+    await incrementVoteCount(env, `vote-count:${body.targetHash}`, countField, async () => {
+      const counts = { up: 0, flags: 0 };
+      const voteKeys = await listAllKeys(env, `vote:${body.targetHash}:`);
+      for (const key of voteKeys) {
+        if (key === voteKey) continue;
+        const vote = await env.LEADERBOARD_QUEUE.get(key, { type: 'json' });
+        if (vote && vote.voteType === 'up') counts.up++;
+        else if (vote && vote.voteType === 'flag') counts.flags++;
+      }
+      return counts;
+    });
+
     return new Response(JSON.stringify({
       success: true,
       message: 'Vote recorded'
@@ -496,6 +542,12 @@ async function handleFeedbackVote(request, env) {
 
     await env.LEADERBOARD_QUEUE.put(voteKey, JSON.stringify(voteData));
 
+    // Update the aggregate read by the queue processor (seeding skips the vote just stored)
+    await incrementVoteCount(env, `feedback-vote-count:${body.feedbackId}`, 'votes', async () => {
+      const voteKeys = await listAllKeys(env, `feedback-vote:${body.feedbackId}:`);
+      return { votes: voteKeys.filter(key => key !== voteKey).length };
+    });
+
     return new Response(JSON.stringify({
       success: true,
       message: 'Feedback vote recorded'